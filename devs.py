@@ -1,39 +1,126 @@
 from dataclasses import dataclass
-from serial.tools.list_ports import comports
-from uhubctl import Uhubctl
-import yaml
+from functools import cached_property
+import json
 import os
 import sys
+import time
+
+# The heavier modules (yaml, serial, uhubctl)
+# are only imported when they are first needed.
+
+def yaml_safe_load(stream) -> object:
+    """
+    Parse a YAML stream with the safe loader.
+    The libyaml C parser is used when available, it is considerably
+    faster than the pure Python one.
+    """
+    import yaml
+
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+def get_uhubctl() -> type:
+    """
+    Get the Uhubctl class, importing the uhubctl module on first use.
+    """
+    from uhubctl import Uhubctl
+
+    return Uhubctl
+
+def load_yml_json_cache(cache_file: str, src_key: list) -> tuple[bool, object]:
+    """
+    Load the content of a YAML file from its JSON cache file.
+    The cache is only valid if it was generated from a YAML file with
+    the same modification time and size (src_key).
+    Returns a (hit, content) tuple.
+    """
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if cache.get("__src__") == src_key:
+            return True, cache.get("content")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    return False, None
+
+def save_yml_json_cache(cache_file: str, src_key: list, content: object) -> None:
+    """
+    Store the content of a YAML file in its JSON cache file.
+    The file is written to a temporary file first and then atomically
+    replaced, so concurrent readers never see a partial cache.
+    Caching is best effort: content which does not survive a JSON
+    round trip (e.g. non-string keys, dates) or a non-writable
+    directory simply skip the cache.
+    """
+    cache = {"__src__": src_key, "content": content}
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        cache_str = json.dumps(cache)
+        if json.loads(cache_str) != cache:
+            return
+        with open(tmp_file, "w") as f:
+            f.write(cache_str)
+        os.replace(tmp_file, cache_file)
+    except (OSError, TypeError, ValueError):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 def load_yml_file(file: str) -> dict:
     if not os.path.exists(file):
         print(f'error: YAML file "{file}" does not exist')
         sys.exit(1)
 
+    # The parsed content is cached in a "<file>.json" file next to
+    # the YAML file. JSON parsing is much faster than YAML parsing.
+    yml_stat = os.stat(file)
+    src_key = [yml_stat.st_mtime_ns, yml_stat.st_size]
+    cache_file = file + ".json"
+
+    hit, yml_dict = load_yml_json_cache(cache_file, src_key)
+    if hit:
+        return yml_dict
+
     try:
         with open(file, "r") as f:
-            yml_dict = yaml.safe_load(f)
+            yml_dict = yaml_safe_load(f)
     except:
         print(f'error: unable to open YAML file "{file}"')
         sys.exit(1)
 
+    save_yml_json_cache(cache_file, src_key, yml_dict)
+
     return yml_dict
 
-@dataclass
+class SharedHwController:
+    """
+    Class attribute holding a single hardware controller shared by all
+    the instances of the class. The controller is created on first access,
+    and it then replaces this descriptor in the class.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        hw_controller = get_uhubctl()()
+        setattr(owner, self.name, hw_controller)
+        return hw_controller
+
+@dataclass(slots=True)
 class DevSwitch:
 
     hub: str
     port: int
-    hw_controller : object = Uhubctl()
+    hw_controller = SharedHwController()
 
     def on(self) -> None:
-        self.hw_controller.run_action(Uhubctl.Cmd.on, self.hub, self.port)
+        self.hw_controller.run_action(get_uhubctl().Cmd.on, self.hub, self.port)
 
     def off(self) -> None:
-        self.hw_controller.run_action(Uhubctl.Cmd.off, self.hub, self.port)
+        self.hw_controller.run_action(get_uhubctl().Cmd.off, self.hub, self.port)
 
     def reset(self) -> None:
-        self.hw_controller.run_action(Uhubctl.Cmd.cycle, self.hub, self.port)
+        self.hw_controller.run_action(get_uhubctl().Cmd.cycle, self.hub, self.port)
 
     def status(self) -> str:
         return self.hw_controller.get_status(self.hub, self.port)
@@ -47,11 +134,12 @@ class DevSwitch:
         # seen as a potential interface to device switches. 
         unique_hubs = set([hub for hub, port in hubs_ports])
         for hub in unique_hubs:
-            cls.hw_controller.run_action(Uhubctl.Cmd.cycle, hub, None)
+            cls.hw_controller.run_action(get_uhubctl().Cmd.cycle, hub, None)
 
     @classmethod
     def create_from_uid(cls, uid: str) -> "DevSwitch":
-        
+        # The controller answers the lookups of several devices
+        # from the same recent hubs scan
         hub, port = cls.hw_controller.get_hub_port_by_desc(uid)
         
         if hub and port:
@@ -70,47 +158,131 @@ class DevSwitch:
         
         return switch_list
     
-@dataclass
+@dataclass(slots=True)
 class DevAccessSerial:
 
     address: str
     # TODO: Add additional requirements for accessibility:
     #     #       - the device is not busy (fuser or such as in makersHIL)
 
+    # Snapshot of the enumerated serial ports, and its index mapping
+    # serial numbers to device addresses. They are built on demand and
+    # they are valid during ports_snapshot_ttl_s seconds.
+    ports_snapshot_ttl_s = 5.0
+    __ports = None
+    __ports_time = 0.0
+    __by_uid = None
+
     def get_address(self) -> str:
         return self.address
 
     @classmethod
     def create_from_uid(cls, uid: str) -> "DevAccessSerial":
-        for port in comports():
-            if port.serial_number == uid:
-                return cls(address=port.device)
+        address = cls.__get_index().get(uid)
+        if address:
+            return cls(address=address)
         
         return None   
+
+    @classmethod
+    def scan(cls) -> list["DevAccessSerial"]:
+
+        access_list = []
+        for port in cls.__ports_snapshot():
+            access_list.append(cls(address=port.device))
+
+        return access_list
+
+    @classmethod
+    def invalidate_cache(cls) -> None:
+        """
+        Discard the serial ports snapshot. The serial ports will be
+        enumerated again on the next lookup or scan. Use it when the
+        attached hardware may have changed.
+        """
+        cls.__ports = None
+        cls.__by_uid = None
+
+    @classmethod
+    def __ports_snapshot(cls) -> list:
+        """
+        Get the enumerated serial ports, only enumerating them again
+        if there is no snapshot or it has expired.
+        """
+        if cls.__ports is None or time.monotonic() - cls.__ports_time > cls.ports_snapshot_ttl_s:
+            from serial.tools.list_ports import comports
+
+            cls.__ports = comports()
+            cls.__ports_time = time.monotonic()
+            cls.__by_uid = None
+
+        return cls.__ports
+
+    @classmethod
+    def __get_index(cls) -> dict[str, str]:
+        ports = cls.__ports_snapshot()
+        if cls.__by_uid is None:
+            # A probe can expose several ports with the same serial number,
+            # the first enumerated port is kept.
+            by_uid = {}
+            for port in ports:
+                if port.serial_number is not None:
+                    by_uid.setdefault(port.serial_number, port.device)
+            cls.__by_uid = by_uid
+
+        return cls.__by_uid
     
+# Device is not slotted, the cached properties need the instance __dict__
 @dataclass
 class Device:
 
     name: str
     uid: str
     features: list[str]
-    access: DevAccessSerial = None
-    switch: DevSwitch = None
 
-    def __post_init__(self):
-        self.access = DevAccessSerial.create_from_uid(self.uid)
-        self.switch = DevSwitch.create_from_uid(self.uid)
+    # The access and switch are looked up on first use, as this
+    # requires enumerating the attached hardware.
+    @cached_property
+    def access(self) -> DevAccessSerial:
+        return DevAccessSerial.create_from_uid(self.uid)
+
+    @cached_property
+    def switch(self) -> DevSwitch:
+        return DevSwitch.create_from_uid(self.uid)
 
     @classmethod
     def load_device_list_from_yml(cls, devs_yml_file: str) -> list["Device"]:
+        """
+        Load the device list from a YAML file.
+        The parsed YAML file is cached (see load_yml_file()), but new
+        devices are constructed on every load, so that their access and
+        switch are looked up again in the currently attached hardware.
+        """
         dev_yml_dict = load_yml_file(devs_yml_file)
-        
+
+        # The devices access will be looked up in a new
+        # enumeration of the serial ports, shared by all devices
+        DevAccessSerial.invalidate_cache()
+
+        def intern_str(value):
+            """
+            Intern the string values, as they are compared often
+            and repeated among devices (e.g. names, features).
+            """
+            if isinstance(value, str):
+                return sys.intern(value)
+            return value
+
         dev_obj_list = []
         for dev in dev_yml_dict:
+            feature_list = dev.get('features') or []
+            if not isinstance(feature_list, list):
+                feature_list = [feature_list]
+
             device = Device(
-                name=dev.get('name', ''),
-                uid=dev.get('uid', ''),
-                features=dev.get('features', []),
+                name=intern_str(dev.get('name', '')),
+                uid=intern_str(dev.get('uid', '')),
+                features=[intern_str(feature) for feature in feature_list],
             )
             dev_obj_list.append(device)
 
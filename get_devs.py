@@ -1,6 +1,6 @@
 # This script support the discovery of attached KitProg3 devices
 
-import argparse, glob, os, re, subprocess, yaml
+import glob, os, re, subprocess, yaml
 
 
 def get_devs_from_yml(dev_yml):
@@ -14,6 +14,28 @@ def get_devs_from_yml(dev_yml):
     return board_sn_map
 
 
+# Board type index of the parsed devices yml files.
+# Keyed by file path and modification time, so that
+# the file is only parsed again if it changes.
+board_index_cache = {}
+
+
+def get_board_index_from_yml(dev_yml):
+    if not os.path.exists(dev_yml):
+        raise Exception("devices .yml file does not exit")
+
+    index_key = (os.path.realpath(dev_yml), os.stat(dev_yml).st_mtime_ns)
+    if index_key not in board_index_cache:
+        board_index = {}
+        for board_sn_map_item in get_devs_from_yml(dev_yml):
+            board_index.setdefault(board_sn_map_item["board_type"], []).append(
+                board_sn_map_item
+            )
+        board_index_cache[index_key] = board_index
+
+    return board_index_cache[index_key]
+
+
 def udevadm_get_kitprog3_attached_devs():
     def get_ttyACM_dev_list():
         return glob.glob(os.path.join("/dev", "ttyACM*"), recursive=False)
@@ -34,14 +56,12 @@ def udevadm_get_kitprog3_attached_devs():
 
         return udevadm_output_lines
 
-    def is_kitprog_device(udevadm_output_lines):
-        def is_device_attr_found(line, pattern):
-            attr = re.search(pattern, str(line))
-            if attr is not None:
-                return True
-
-            return False
+    def get_udevadm_output_text(udevadm_output_lines):
+        # Join all the attribute lines once, so that each attribute
+        # pattern is searched in a single pass over the whole output.
+        return "".join(line.decode("utf-8", errors="replace") for line in udevadm_output_lines)
 
+    def is_kitprog_device(udevadm_output):
         # It is a kitprog probe is these matches
         # are found in the device attributes
         required_attr_match = [
@@ -49,25 +69,18 @@ def udevadm_get_kitprog3_attached_devs():
             r'ATTRS{product}==".*KitProg\d.*"',
         ]
 
-        attr_found_count = 0
-
-        for line in udevadm_output_lines:
-            for req_match in required_attr_match:
-                if is_device_attr_found(line, req_match):
-                    attr_found_count += 1
+        for req_match in required_attr_match:
+            if re.search(req_match, udevadm_output) is None:
+                return False
 
-        if attr_found_count == len(required_attr_match):
-            return True
+        return True
 
-        return False
-
-    def get_kitprog_serial_number(udevadm_output_lines):
-        for line in udevadm_output_lines:
-            attr = re.search('ATTRS{serial}=="[a-zA-Z0-9]*"', str(line))
-            if attr is not None:
-                sn = attr.group()[len("ATTRS{serial}==") :]
-                sn = sn.strip('"')
-                return sn
+    def get_kitprog_serial_number(udevadm_output):
+        attr = re.search('ATTRS{serial}=="[a-zA-Z0-9]*"', udevadm_output)
+        if attr is not None:
+            sn = attr.group()[len("ATTRS{serial}==") :]
+            sn = sn.strip('"')
+            return sn
 
         return ""
 
@@ -76,9 +89,9 @@ def udevadm_get_kitprog3_attached_devs():
 
     if dev_list != []:
         for dev in dev_list:
-            udevadm_output_lines = get_udevadm_port_attrs_output(dev)
-            if is_kitprog_device(udevadm_output_lines):
-                sn = get_kitprog_serial_number(udevadm_output_lines)
+            udevadm_output = get_udevadm_output_text(get_udevadm_port_attrs_output(dev))
+            if is_kitprog_device(udevadm_output):
+                sn = get_kitprog_serial_number(udevadm_output)
                 # new kp device
                 kp_dev = {}
                 kp_dev["port"] = dev
@@ -91,25 +104,29 @@ def udevadm_get_kitprog3_attached_devs():
 
 def get_devices(search_param, board=None, devs_yml=None, hw_ext=None):
     dev_list = []
-    port_sn_map = udevadm_get_kitprog3_attached_devs()
 
     if board is not None and devs_yml is not None:
-        board_sn_map_list = get_devs_from_yml(devs_yml)
+        # Cheap lookup first: only if the yml file has devices for
+        # the board, the attached devices are queried to udevadm.
+        board_sn_map_list = get_board_index_from_yml(devs_yml).get(board, [])
+        if not board_sn_map_list:
+            return dev_list
+
+        port_sn_map = udevadm_get_kitprog3_attached_devs()
 
         for board_sn_map_item in board_sn_map_list:
-            if board == board_sn_map_item["board_type"]:
-                for dev in port_sn_map:
-                    for mapped_board_item in board_sn_map_item["board_list"]:
-                        if dev["sn"] == mapped_board_item["sn"]:
-                            if hw_ext is None:
-                                dev_list.append(dev[search_param])
-                                break
-                            if hw_ext is not None:
-                                if "hw_ext" in mapped_board_item.keys():
-                                    if hw_ext == mapped_board_item["hw_ext"]:
-                                        dev_list.append(dev[search_param])
-                                        break
+            # Index the serial numbers of the board (with the required
+            # hw_ext) to look up each attached device only once.
+            board_sn_set = {
+                mapped_board_item["sn"]
+                for mapped_board_item in board_sn_map_item["board_list"]
+                if hw_ext is None or hw_ext == mapped_board_item.get("hw_ext")
+            }
+            for dev in port_sn_map:
+                if dev["sn"] in board_sn_set:
+                    dev_list.append(dev[search_param])
     else:
+        port_sn_map = udevadm_get_kitprog3_attached_devs()
         for dev in port_sn_map:
             dev_list.append(dev[search_param])
 
@@ -125,6 +142,9 @@ def get_devices_port(board=None, devs_yml=None, hw_ext=None):
 
 
 def parser():
+    # Only imported for the command line use, not when imported as module
+    import argparse
+
     def main_parser_func(args):
         parser.print_help()
 
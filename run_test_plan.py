@@ -1,15 +1,240 @@
-import argparse
 from dataclasses import dataclass
+import functools
+import hashlib
+import json
 from abc import ABC, abstractmethod
 from enum import Enum
 import os
 import sys
 import subprocess
-import yaml
 import time
+from types import MethodType
 
 from get_devs import get_devices_port
 
+# Absolute path of the directory of this script
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _default_test_plan() -> str:
+    """
+    Default test plan file, "test-plan.yml" in the script directory.
+    """
+    return os.path.join(_SCRIPT_DIR, "test-plan.yml")
+
+
+def _default_mpy_root_dir() -> str:
+    """
+    Default MicroPython root directory, two levels up from the script directory.
+    """
+    return os.path.abspath(os.path.join(_SCRIPT_DIR, "..", ".."))
+
+
+def _test_plan_cache_file(test_plan_yaml: str) -> str:
+    """
+    Get the JSON cache file of a test plan file.
+    The test plan is usually in the MicroPython repository, so the cache
+    is not stored next to it, but in the user cache directory
+    ($XDG_CACHE_HOME/mpy-test-ext, by default ~/.cache/mpy-test-ext).
+    The cache file name is derived from the test plan real path.
+    """
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    path_hash = hashlib.sha256(os.path.realpath(test_plan_yaml).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, "mpy-test-ext", f"test-plan-{path_hash}.json")
+
+
+def _load_test_plan_cache(cache_file: str, src_key: list) -> tuple[bool, object]:
+    """
+    Load a parsed test plan from its JSON cache file.
+    The cache is only valid if it was generated from a test plan file
+    with the same modification time and size (src_key).
+    Returns a (hit, test plan) tuple.
+    """
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if cache.get("__src__") == src_key:
+            return True, cache.get("content")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    return False, None
+
+
+def _save_test_plan_cache(cache_file: str, src_key: list, test_plan: object) -> None:
+    """
+    Store a parsed test plan in its JSON cache file.
+    The file is written to a temporary file first and then atomically
+    replaced. Caching is best effort: a test plan which does not survive
+    a JSON round trip or a non-writable cache directory skip the cache.
+    """
+    cache = {"__src__": src_key, "content": test_plan}
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        cache_str = json.dumps(cache)
+        if json.loads(cache_str) != cache:
+            return
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, "w") as f:
+            f.write(cache_str)
+        os.replace(tmp_file, cache_file)
+    except (OSError, TypeError, ValueError):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _load_test_plan_yaml(test_plan_yaml: str) -> object:
+    """
+    Load a YAML test plan file.
+    The parsed test plan is cached as JSON (see _test_plan_cache_file()),
+    which is much faster to parse, and the YAML file is only parsed again
+    when it changes. The libyaml C parser is used when available.
+    """
+    yml_stat = os.stat(test_plan_yaml)
+    src_key = [yml_stat.st_mtime_ns, yml_stat.st_size]
+    cache_file = _test_plan_cache_file(test_plan_yaml)
+
+    hit, test_plan = _load_test_plan_cache(cache_file, src_key)
+    if hit:
+        return test_plan
+
+    import yaml
+
+    try:
+        with open(test_plan_yaml, "r") as f:
+            test_plan = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    except:
+        print(f'error: unable to open YAML file "{test_plan_yaml}"')
+        sys.exit(1)
+
+    _save_test_plan_cache(cache_file, src_key, test_plan)
+
+    return test_plan
+
+
+_script_list_schema = {
+    "anyOf": [
+        {"type": "string"},
+        {"type": "array", "items": {"type": "string"}},
+    ]
+}
+
+_device_list_schema = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "board": {"type": "string"},
+            "version": {"type": ["string", "number"]},
+        },
+        "required": ["board"],
+    },
+}
+
+TEST_PLAN_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "type": {"enum": ["single", "single_post_delay", "multi", "multi_stub", "custom"]},
+            "test": {
+                "type": "object",
+                "properties": {
+                    "script": _script_list_schema,
+                    "exclude": _script_list_schema,
+                    "device": _device_list_schema,
+                    "post_test_delay_ms": {"type": "number", "minimum": 0},
+                    "post_stub_delay_ms": {"type": "number", "minimum": 0},
+                    "args": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["script"],
+            },
+            "stub": {
+                "type": "object",
+                "properties": {
+                    "script": {"type": "string"},
+                    "device": _device_list_schema,
+                    "post_stub_delay_ms": {"type": "number", "minimum": 0},
+                },
+                "required": ["script"],
+            },
+        },
+        "required": ["name", "test"],
+    },
+}
+
+
+@functools.cache
+def _compile_test_plan_schema():
+    """
+    Compile the test plan schema into a python validation function.
+    This is only done on the first test plan validation.
+    """
+    import fastjsonschema
+
+    return fastjsonschema.compile(TEST_PLAN_SCHEMA)
+
+
+def _validate_test_plan(test_plan: object, test_plan_yaml: str) -> None:
+    """
+    Validate the test plan against the test plan schema, before running any test.
+    It requires the fastjsonschema package.
+    """
+    try:
+        import fastjsonschema
+    except ImportError:
+        print('error: the "fastjsonschema" package is required to validate the test plan')
+        sys.exit(1)
+
+    try:
+        _compile_test_plan_schema()(test_plan)
+    except fastjsonschema.JsonSchemaException as e:
+        print(f'error: invalid test plan file "{test_plan_yaml}": {e.message}')
+        sys.exit(1)
+
+
+def _iter_py_files(path: str):
+    """
+    Recursively yield the .py files in a directory.
+    The os.scandir entries cache the file type, saving stat calls.
+    As with os.walk, the files of a directory are yielded before the
+    ones in its subdirectories, and directory symlinks are not followed.
+    """
+    sub_dir_list = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    sub_dir_list.append(entry.path)
+            elif entry.name.endswith(".py"):
+                yield entry.path
+
+    for sub_dir in sub_dir_list:
+        yield from _iter_py_files(sub_dir)
+
+
+@functools.cache
+def _import_mpremote_main(mpremote_dir: str):
+    """
+    Import the mpremote main module from the MicroPython tools directory.
+    Returns None if it cannot be imported (e.g. missing pyserial),
+    and mpremote is then run as a subprocess.
+    The tools directory is only added to sys.path during the import,
+    the package submodules are then found through the package itself.
+    """
+    sys.path.insert(0, mpremote_dir)
+    try:
+        import mpremote.main
+    except ImportError:
+        return None
+    finally:
+        sys.path.remove(mpremote_dir)
+
+    return mpremote.main
+
 
 class TestRunner:
     """
@@ -30,14 +255,14 @@ class TestRunner:
         self,
         name: str,
         test_script_list: list[str],
-        test_exclude_list: list[str] = [],
+        test_exclude_list: list[str] | None = None,
         post_test_delay_ms: int = 0,
         stub_script: str = None,
-        supported_dut_dev_list: list[dict] = [],
-        supported_stub_dev_list: list[dict] = [],
+        supported_dut_dev_list: list[dict] | None = None,
+        supported_stub_dev_list: list[dict] | None = None,
         post_stub_delay_ms: int = 0,
         test_type: str = None,
-        custom_args: list[str] = [],
+        custom_args: list[str] | None = None,
         myp_test_dir: str = None,
     ):
         """
@@ -45,20 +270,38 @@ class TestRunner:
         At least for a single test the test name and the test script list must be provided.
         The test script paths need to be relative to the MicroPython test directory (/tests).
         The rest of the parameters are required depending on the test type.
+        Not provided lists default to an empty tuple, shared by all instances.
+
+        The lists are usually parsed from the test plan YAML file.
+        They are stored as tuples and never modified after construction,
+        so they can be shared by the retries and the parallel test runs
+        without copying them.
         """
         self.name = name
-        self.test_script_list = test_script_list
-        self.test_exclude_list = test_exclude_list
+        self.test_script_list = tuple(test_script_list)
+        self.test_exclude_list = tuple(test_exclude_list or ())
         self.post_test_delay_ms = post_test_delay_ms
         self.stub_script = stub_script
-        self.supported_dut_dev_list = supported_dut_dev_list
-        self.supported_stub_dev_list = supported_stub_dev_list
+        self.supported_dut_dev_list = tuple(supported_dut_dev_list or ())
+        self.supported_stub_dev_list = tuple(supported_stub_dev_list or ())
+        self.__dut_dev_by_board = TestRunner.__index_dev_by_board(self.supported_dut_dev_list)
+        self.__stub_dev_by_board = TestRunner.__index_dev_by_board(self.supported_stub_dev_list)
         self.post_stub_delay_ms = post_stub_delay_ms
-        self.custom_args = custom_args
+        self.custom_args = tuple(custom_args or ())
+        self.__dir_expand_cache: dict[str, list[str]] = {}
+        self.__is_dir_cache: dict[str, bool] = {}
+        self.__single_test_args: tuple[list[str], list[str]] | None = None
+        self.__post_delay_test_args: list[str] | None = None
+        # Only set while the test is run by run_isolated()
+        self.__result_dir: str | None = None
+        self.__output_list: list[str] | None = None
         self.type = (
             test_type if test_type is not None else TestRunner.__determine_implicit_type(self)
         )
-        self.runner_func = TestRunner.__get_runner_func(self, self.type)
+        if self.type not in TestRunner.__runner_funcs:
+            print(f'error: unknown type "{self.type}" of test "{self.name}"')
+            sys.exit(1)
+        self.runner_func = MethodType(TestRunner.__runner_funcs[self.type], self)
         self.myp_test_dir = (
             os.path.join(TestRunner.__set_default_mpy_dir(), "tests")
             if myp_test_dir is None
@@ -68,16 +311,37 @@ class TestRunner:
     def run(self, dut_port: str, stub_port: str = None) -> int:
         """
         Run the test using the appropriate runner function.
-        Before running the test, change to the MicroPython test directory.
-        All test scripts are relative to that directory.
+        All test scripts are relative to the MicroPython test directory,
+        which is used as working directory of the test subprocesses.
+        The current working directory of this process is not changed.
         """
-        os.chdir(self.myp_test_dir)
-
         if "multi" in self.type:
             return self.runner_func(dut_port, stub_port)
         else:
             return self.runner_func(dut_port)
 
+    def run_isolated(self, dut_port: str, stub_port: str = None) -> tuple[int, str]:
+        """
+        Run the test as run() does, isolated from other tests run concurrently.
+        The run-tests.py results are stored in a results directory of this
+        run only, which is removed afterwards. The output of the test is
+        captured and returned, so that it can be printed at once.
+        Returns a tuple of (return code, output).
+        The same TestRunner instance must not be run concurrently.
+        """
+        import shutil
+        import tempfile
+
+        self.__result_dir = tempfile.mkdtemp(prefix="mpy-test-results-")
+        self.__output_list = []
+        try:
+            ret_code = self.run(dut_port, stub_port)
+            return ret_code, "".join(self.__output_list)
+        finally:
+            shutil.rmtree(self.__result_dir, ignore_errors=True)
+            self.__result_dir = None
+            self.__output_list = None
+
     def get_supported_dev_list(
         self, dev_role: DeviceRole, board: str, version: str = None
     ) -> list[dict]:
@@ -90,18 +354,17 @@ class TestRunner:
         for the stub as well.
         """
         if dev_role == TestRunner.DeviceRole.DUT:
-            device_list = self.supported_dut_dev_list
+            device_by_board = self.__dut_dev_by_board
         elif dev_role == TestRunner.DeviceRole.STUB:
-            device_list = self.supported_stub_dev_list
+            device_by_board = self.__stub_dev_by_board
             # For multi, the supported stub list is the same as dut
             if "multi" == self.type:
-                device_list = self.supported_dut_dev_list
+                device_by_board = self.__dut_dev_by_board
 
         supported_device_list = []
-        for device in device_list:
-            if board == device.get("board"):
-                if version is None or device.get("version") == version:
-                    supported_device_list.append(device)
+        for device in device_by_board.get(board, []):
+            if version is None or device.get("version") == version:
+                supported_device_list.append(device)
 
         return supported_device_list
 
@@ -157,16 +420,9 @@ class TestRunner:
             print(f'error: test plan file "{test_plan_yaml}" does not exist')
             sys.exit(1)
 
-        try:
-            with open(test_plan_yaml, "r") as f:
-                test_plan = yaml.safe_load(f)
-        except:
-            print(f'error: unable to open YAML file "{test_plan_yaml}"')
-            sys.exit(1)
+        test_plan = _load_test_plan_yaml(test_plan_yaml)
 
-        # TODO: we can add schema validation, which involves
-        # defining a schema and using a non built-in library like
-        # https://github.com/pyeve/cerberus (check hil-makers schema validation)
+        _validate_test_plan(test_plan, test_plan_yaml)
 
         test_list = []
         for test in test_plan:
@@ -213,19 +469,16 @@ class TestRunner:
             else:
                 return "single"
 
-    def __get_runner_func(self, type: str) -> callable:
+    @staticmethod
+    def __index_dev_by_board(device_list: list[dict]) -> dict[str, list[dict]]:
         """
-        Get the appropriate runner function based on the test type.
+        Group the supported devices by board name, keeping their order.
         """
-        runner_func = {
-            "single": self.__run_single_test,
-            "single_post_delay": self.__run_single_post_delay_test,
-            "multi_stub": self.__run_multi_stub_test,
-            "multi": self.__run_multi_test,
-            "custom": self.__custom_test,
-        }
+        device_by_board = {}
+        for device in device_list:
+            device_by_board.setdefault(device.get("board"), []).append(device)
 
-        return runner_func.get(type, None)
+        return device_by_board
 
     def __run_single_test_cmd(
         self, dut_port: str, test_args: list[str], exclude_args: list[str]
@@ -238,22 +491,75 @@ class TestRunner:
         run_test_cmd.extend(test_args)
         run_test_cmd.extend(exclude_args)
 
-        run_test_proc = subprocess.run(run_test_cmd)
+        result_dir_args = []
+        if self.__result_dir is not None:
+            result_dir_args = ["--result-dir", self.__result_dir]
+
+        run_test_cmd.extend(result_dir_args)
+
+        return_code = self.__run_subprocess(run_test_cmd)
 
-        if run_test_proc.returncode != 0:
+        if return_code != 0:
             run_test_print_fail_cmd = ["python", "run-tests.py", "--print-failures"]
-            subprocess.run(run_test_print_fail_cmd)
+            run_test_print_fail_cmd.extend(result_dir_args)
+            self.__run_subprocess(run_test_print_fail_cmd)
+
+            self.__clean_failures()
+
+        return return_code
+
+    def __run_subprocess(self, cmd: list[str]) -> int:
+        """
+        Run a test subprocess in the MicroPython test directory.
+        Its output is captured when run by run_isolated().
+        Returns the subprocess return code.
+        """
+        if self.__output_list is None:
+            return subprocess.run(cmd, cwd=self.myp_test_dir).returncode
+
+        proc = subprocess.run(
+            cmd,
+            cwd=self.myp_test_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+        )
+        self.__output_list.append(proc.stdout)
+        return proc.returncode
+
+    def __print(self, message: str) -> None:
+        """
+        Print a message of the test, captured with the test
+        output when run by run_isolated().
+        """
+        if self.__output_list is None:
+            print(message)
+        else:
+            self.__output_list.append(message + "\n")
 
-            run_test_clean_fail_cmd = ["python", "run-tests.py", "--clean-failures"]
-            subprocess.run(run_test_clean_fail_cmd)
+    def __clean_failures(self) -> None:
+        """
+        Remove the failed tests results with "run-tests.py --clean-failures".
+        When run by run_isolated(), the whole results directory of the run
+        is removed afterwards, so starting another python subprocess
+        to clean it is not required.
+        """
+        if self.__result_dir is not None:
+            return
 
-        return run_test_proc.returncode
+        run_test_clean_fail_cmd = ["python", "run-tests.py", "--clean-failures"]
+        self.__run_subprocess(run_test_clean_fail_cmd)
 
     def __run_single_test(self, dut_port: str) -> int:
         """
         Run a single test with the given dut_port.
-        It constructs the test arguments and exclude arguments
+        It constructs the test arguments and exclude arguments.
+        These only depend on the test definition, so they are
+        constructed on the first run and reused on the retries.
         """
+        if self.__single_test_args is not None:
+            return self.__run_single_test_cmd(dut_port, *self.__single_test_args)
 
         def get_test_list_args():
             """
@@ -261,7 +567,7 @@ class TestRunner:
             """
             test_list_args = []
             for test in self.test_script_list:
-                if os.path.isdir(test):
+                if self.__is_test_dir(test):
                     test_list_args.append("-d")
 
                 test_list_args.append(test)
@@ -278,15 +584,44 @@ class TestRunner:
                 test_list_exclude_args.append(excluded_test)
             return test_list_exclude_args
 
-        test_list_args = get_test_list_args()
-        test_list_exclude_args = get_test_list_exclude_args()
+        self.__single_test_args = (get_test_list_args(), get_test_list_exclude_args())
+
+        return self.__run_single_test_cmd(dut_port, *self.__single_test_args)
+
+    def __is_test_dir(self, test: str) -> bool:
+        """
+        Check if a test script path (relative to the MicroPython
+        test directory) is a directory.
+        The result is cached per test script path, as it is checked
+        on every run and retry of the test.
+        """
+        if test not in self.__is_dir_cache:
+            self.__is_dir_cache[test] = os.path.isdir(os.path.join(self.myp_test_dir, test))
+
+        return self.__is_dir_cache[test]
+
+    def __expand_dir(self, test_dir: str) -> list[str]:
+        """
+        Expand a test directory to all the .py files in it (recursively).
+        The paths are returned relative to the MicroPython test directory,
+        the same way the test directory is given.
+        The result is cached per directory, as it is required on every
+        run and retry of the test.
+        """
+        if test_dir not in self.__dir_expand_cache:
+            abs_test_dir = os.path.join(self.myp_test_dir, test_dir)
+            self.__dir_expand_cache[test_dir] = [
+                test_dir + test_file[len(abs_test_dir) :]
+                for test_file in _iter_py_files(abs_test_dir)
+            ]
 
-        return self.__run_single_test_cmd(dut_port, test_list_args, test_list_exclude_args)
+        return self.__dir_expand_cache[test_dir]
 
     def __run_single_post_delay_test(self, dut_port: str) -> int:
         """
         Run single tests with a delay between each test.
-
+        The expanded test list is constructed on the first run
+        and reused on the retries.
         """
 
         def get_test_list_args():
@@ -296,12 +631,8 @@ class TestRunner:
             """
             test_list_args = []
             for test in self.test_script_list:
-                if os.path.isdir(test):
-                    for root, dirs, files in os.walk(test):
-                        for file in files:
-                            if file.endswith(".py"):
-                                test_file = os.path.join(root, file)
-                                test_list_args.append(test_file)
+                if self.__is_test_dir(test):
+                    test_list_args.extend(self.__expand_dir(test))
                 else:
                     test_list_args.append(test)
 
@@ -312,14 +643,17 @@ class TestRunner:
             Remove excluded tests from the test list arguments.
             """
             if self.test_exclude_list:
-                for excluded_test in self.test_exclude_list:
-                    if excluded_test in test_list_args:
-                        test_list_args.remove(excluded_test)
+                excluded_test_set = set(self.test_exclude_list)
+                test_list_args[:] = [
+                    test for test in test_list_args if test not in excluded_test_set
+                ]
 
-        test_list_args = get_test_list_args()
-        remove_excluded_tests(test_list_args)
+        if self.__post_delay_test_args is None:
+            test_list_args = get_test_list_args()
+            remove_excluded_tests(test_list_args)
+            self.__post_delay_test_args = test_list_args
 
-        for test in test_list_args:
+        for test in self.__post_delay_test_args:
             return_code = self.__run_single_test_cmd(dut_port, [test], [])
             if return_code != 0:
                 return return_code
@@ -333,11 +667,51 @@ class TestRunner:
         """
         Run the stub script on the stub device.
         It uses the mpremote tool to connect to the stub device and run the script.
-        """
-        mpremote_py = os.path.join(self.myp_test_dir, "..", "tools", "mpremote", "mpremote.py")
+        mpremote is run in this process when it can be imported,
+        saving the startup of a new python interpreter for every stub.
+        Except when run by run_isolated(), as its output can only
+        be captured from a subprocess.
+        """
+        mpremote_dir = os.path.join(self.myp_test_dir, "..", "tools", "mpremote")
+        mpremote_main = None
+        if self.__output_list is None:
+            mpremote_main = _import_mpremote_main(os.path.abspath(mpremote_dir))
+
+        if mpremote_main is not None:
+            # The stub script path is relative to the MicroPython test directory
+            stub_script = os.path.join(self.myp_test_dir, self.stub_script)
+            return TestRunner.__run_mpremote_in_process(
+                mpremote_main, ["connect", stub_port, "run", "--no-follow", stub_script]
+            )
+
+        mpremote_py = os.path.join(mpremote_dir, "mpremote.py")
         stub_run_cmd = [mpremote_py, "connect", stub_port, "run", "--no-follow", self.stub_script]
-        stub_run_proc = subprocess.run(stub_run_cmd)
-        return stub_run_proc.returncode
+        return self.__run_subprocess(stub_run_cmd)
+
+    @staticmethod
+    def __run_mpremote_in_process(mpremote_main, mpremote_args: list[str]) -> int:
+        """
+        Run mpremote main() with the given arguments.
+        The exit code is returned as the one of the subprocess would be.
+        Any other mpremote error (e.g. serial transport errors) fails
+        this run only, as a failing subprocess would.
+        """
+        argv = sys.argv
+        sys.argv = ["mpremote"] + mpremote_args
+        try:
+            return_code = mpremote_main.main()
+        except SystemExit as e:
+            return_code = e.code
+        except Exception as e:
+            print(f"error: mpremote {' '.join(mpremote_args)} failed: {e!r}")
+            return_code = 1
+        finally:
+            sys.argv = argv
+
+        if return_code is None:
+            return 0
+
+        return return_code if isinstance(return_code, int) else 1
 
     def __run_multi_stub_test(self, dut_port: str, stub_port: str) -> int:
         """
@@ -368,11 +742,8 @@ class TestRunner:
             """
             test_list = []
             for test in self.test_script_list:
-                if os.path.isdir(test):
-                    for root, dirs, files in os.walk(test):
-                        for file in files:
-                            if file.endswith(".py"):
-                                test_list.append(os.path.join(root, file))
+                if self.__is_test_dir(test):
+                    test_list.extend(self.__expand_dir(test))
                 else:
                     test_list.append(test)
 
@@ -387,11 +758,15 @@ class TestRunner:
             f"{dut_b_port}",
         ]
         multi_test_list_args = get_test_list()
-        multi_test_cmd.extend(multi_test_list_args)
+        if not multi_test_list_args:
+            # run-multitests.py requires at least one test file, and
+            # would only exit with a usage error
+            self.__print(f'error: no multi test scripts found for test "{self.name}"')
+            return 1
 
-        multi_test_proc = subprocess.run(multi_test_cmd)
+        multi_test_cmd.extend(multi_test_list_args)
 
-        return multi_test_proc.returncode
+        return self.__run_subprocess(multi_test_cmd)
 
     # TODO: Add vfs mode to avoid repl tests
     # def vfs_mode_test(self, dut_port):
@@ -411,13 +786,23 @@ class TestRunner:
             if self.custom_args:
                 custom_test_cmd.extend(self.custom_args)
 
-            custom_test_proc = subprocess.run(custom_test_cmd)
-
-            if custom_test_proc.returncode != 0:
+            if self.__run_subprocess(custom_test_cmd) != 0:
                 result = 1
 
         return result
 
+    # Runner function for each test type.
+    # Built once for the class with the plain functions, instead of
+    # binding all the methods for every TestRunner instance.
+    # Only the runner function of the test type is bound (runner_func).
+    __runner_funcs = {
+        "single": __run_single_test,
+        "single_post_delay": __run_single_post_delay_test,
+        "multi_stub": __run_multi_stub_test,
+        "multi": __run_multi_test,
+        "custom": __custom_test,
+    }
+
     @staticmethod
     def __set_default_mpy_dir() -> str:
         """
@@ -425,8 +810,7 @@ class TestRunner:
         The root dir is two levels up from the script path.
         Returns the absolute path to the MicroPython root directory.
         """
-        run_test_plan_script_dir = os.path.abspath(os.path.dirname(__file__))
-        return os.path.abspath(os.path.join(run_test_plan_script_dir, "..", ".."))
+        return _default_mpy_root_dir()
 
 
 class TestPlanResults:
@@ -437,7 +821,7 @@ class TestPlanResults:
     And also it will keep track of the tests that need to be retried.
     """
 
-    @dataclass
+    @dataclass(slots=True)
     class TestRetries:
         test_name: str = ""
         retries: int = 0
@@ -446,11 +830,16 @@ class TestPlanResults:
         """
         Initializes the TestPlanResults instance.
         """
-        self.pass_test_name_list = []
-        self.skip_test_name_list = []
-        self.fail_test_name_list = []
+        self.pass_test_name_list: list[str] = []
+        self.skip_test_name_list: list[str] = []
+        self.fail_test_name_list: list[str] = []
+        # Sets of the passed and failed test names, for the membership checks
+        self.__pass_test_name_set: set[str] = set()
+        self.__fail_test_name_set: set[str] = set()
         self.max_retries = max_retries
         self.retry_test_list: list[TestPlanResults.TestRetries] = []
+        # Index of the retry test list by test name
+        self.__retry_by_name: dict[str, TestPlanResults.TestRetries] = {}
 
     def register_skip(self, test_name: str) -> None:
         """
@@ -465,14 +854,16 @@ class TestPlanResults:
         add it to the retry list with the max retries.
         If the test is already in the fail list, decrease the retries count.
         """
-        if test_name not in self.fail_test_name_list:
+        if test_name not in self.__fail_test_name_set:
             self.fail_test_name_list.append(test_name)
+            self.__fail_test_name_set.add(test_name)
             test_retry = self.TestRetries(test_name=test_name, retries=self.max_retries)
             self.retry_test_list.append(test_retry)
+            self.__retry_by_name[test_name] = test_retry
         else:
-            test_retry_index = self.__get_test_retry_index(test_name)
-            if test_retry_index is not None:
-                self.retry_test_list[test_retry_index].retries -= 1
+            test_retry = self.__retry_by_name.get(test_name)
+            if test_retry is not None:
+                test_retry.retries -= 1
 
     def register_pass(self, test_name: str) -> None:
         """
@@ -481,42 +872,27 @@ class TestPlanResults:
         also remove it from the retry list.
         Then add it to the pass list if not already there.
         """
-        if test_name in self.fail_test_name_list:
+        if test_name in self.__fail_test_name_set:
             self.fail_test_name_list.remove(test_name)
-            test_retry_index = self.__get_test_retry_index(test_name)
-            if test_retry_index is not None:
-                test_retry_obj = self.retry_test_list[test_retry_index]
-                self.retry_test_list.remove(test_retry_obj)
+            self.__fail_test_name_set.remove(test_name)
+            test_retry = self.__retry_by_name.pop(test_name, None)
+            if test_retry is not None:
+                self.retry_test_list.remove(test_retry)
 
-        if test_name not in self.pass_test_name_list:
+        if test_name not in self.__pass_test_name_set:
             self.pass_test_name_list.append(test_name)
+            self.__pass_test_name_set.add(test_name)
 
     def filter_retries(self, test_list: list[TestRunner]) -> list[TestRunner]:
         """
         Given a list of test runners, return a list of test runners
         that need to be retried based on the retry test list.
         """
-        retry_test_runner_list = []
-        for test in test_list:
-            for retry in self.retry_test_list:
-                if test.name == retry.test_name and retry.retries > 0:
-                    retry_test_runner_list.append(test)
-
-        return retry_test_runner_list
-
-    """
-    Private methods
-    """
+        retry_test_name_set = {
+            retry.test_name for retry in self.retry_test_list if retry.retries > 0
+        }
 
-    def __get_test_retry_index(self, test_name) -> int | None:
-        """
-        Return the index of the test in the retry test list.
-        If the test is not found, return None.
-        """
-        for index, test_retry in enumerate(self.retry_test_list):
-            if test_retry.test_name == test_name:
-                return index
-        return None
+        return [test for test in test_list if test.name in retry_test_name_set]
 
 
 class TestPlanLogger:
@@ -535,56 +911,74 @@ class TestPlanLogger:
 
     decorator_line_len = 41
 
+    def __init__(self):
+        """
+        Initializes the TestPlanLogger instance.
+        The colors are disabled when the output is not a terminal (e.g.
+        redirected to a CI log file), unless FORCE_COLOR is set in the environment.
+        The decorator lines are computed once.
+        """
+        if not sys.stdout.isatty() and not os.environ.get("FORCE_COLOR"):
+            for color in [
+                "blue_on",
+                "yellow_on",
+                "magenta_on",
+                "green_on",
+                "red_on",
+                "grey_on",
+                "color_off",
+            ]:
+                setattr(self, color, "")
+
+        self.hash_line = "#" * TestPlanLogger.decorator_line_len
+        self.dash_line = "-" * TestPlanLogger.decorator_line_len
+        self.dot_line = "- " * (int(TestPlanLogger.decorator_line_len / 2)) + "-"
+
     def test_plan_info(
         self, test_plan_file: str, hil_devs_file: str = None, board: str = None
     ) -> None:
-        print(
-            f"{TestPlanLogger.blue_on}"
-            + "#" * TestPlanLogger.decorator_line_len
-            + f"{TestPlanLogger.color_off}"
-        )
+        print(f"{self.blue_on}{self.hash_line}{self.color_off}")
         if board:
-            print(f"{TestPlanLogger.blue_on}> board        : {board}{TestPlanLogger.color_off}")
+            print(f"{self.blue_on}> board        : {board}{self.color_off}")
         print(f"test plan file : {os.path.relpath(test_plan_file)}")
         if hil_devs_file:
             print(f"hil devs file  : {os.path.relpath(hil_devs_file)}")
-        print(
-            f"{TestPlanLogger.blue_on}"
-            + "#" * TestPlanLogger.decorator_line_len
-            + f"{TestPlanLogger.color_off}"
-        )
+        print(f"{self.blue_on}{self.hash_line}{self.color_off}")
 
     def test_info(self, test_name: str, dut_port: str, stub_port: str = None) -> None:
-        print("-" * TestPlanLogger.decorator_line_len)
-        print(f"{TestPlanLogger.blue_on}> running test : {test_name}{TestPlanLogger.color_off}")
+        print(self.dash_line)
+        print(f"{self.blue_on}> running test : {test_name}{self.color_off}")
         print(f"dut port       : {dut_port}")
         if stub_port:
             print(f"stub port      : {stub_port}")
-        print("- " * (int(TestPlanLogger.decorator_line_len / 2)) + "-")
+        print(self.dot_line)
+
+    def test_output(self, output: str) -> None:
+        sys.stdout.write(output)
 
     def test_info_footer(self):
-        print("-" * TestPlanLogger.decorator_line_len)
+        print(self.dash_line)
 
     def test_fail_info(self, test_name: str) -> None:
-        print("- " * (int(TestPlanLogger.decorator_line_len / 2)) + "-")
-        print(f"{TestPlanLogger.red_on}> failed test  : {test_name} {TestPlanLogger.color_off}")
+        print(self.dot_line)
+        print(f"{self.red_on}> failed test  : {test_name} {self.color_off}")
 
     def test_pass_info(self, test_name: str) -> None:
-        print("- " * (int(TestPlanLogger.decorator_line_len / 2)) + "-")
-        print(f"{TestPlanLogger.green_on}> passed test  : {test_name}{TestPlanLogger.color_off}")
+        print(self.dot_line)
+        print(f"{self.green_on}> passed test  : {test_name}{self.color_off}")
 
     def test_skip_info(self, test_name: str) -> None:
-        print("-" * TestPlanLogger.decorator_line_len)
-        print(f"{TestPlanLogger.yellow_on}> skipped test : {test_name}{TestPlanLogger.color_off}")
+        print(self.dash_line)
+        print(f"{self.yellow_on}> skipped test : {test_name}{self.color_off}")
 
     def test_retries_info(self, test_retry_list: list[TestRunner]) -> None:
         if test_retry_list:
-            print("#" * TestPlanLogger.decorator_line_len)
-            print(f"{TestPlanLogger.yellow_on}> retry tests  : ", end="")
-            for test_retry in test_retry_list:
-                print(f"{test_retry.name} ", end="")
-            print(f"{TestPlanLogger.color_off}")
-            print("#" * TestPlanLogger.decorator_line_len)
+            retry_test_names = "".join(f"{test_retry.name} " for test_retry in test_retry_list)
+            sys.stdout.write(
+                f"{self.hash_line}\n"
+                f"{self.yellow_on}> retry tests  : {retry_test_names}{self.color_off}\n"
+                f"{self.hash_line}\n"
+            )
 
     def test_summary_info(
         self,
@@ -592,12 +986,16 @@ class TestPlanLogger:
         fail_test_name_list: list[str],
         skip_test_name_list: list[str],
     ) -> None:
-        print(
-            f"{TestPlanLogger.blue_on}"
-            + "#" * TestPlanLogger.decorator_line_len
-            + f"{TestPlanLogger.color_off}"
-        )
-        print("> test summary : ", end="")
+        """
+        Print the test summary.
+        The whole summary is built first and written at once.
+        """
+
+        def test_name_list_line(color_on: str, title: str, test_name_list: list[str]) -> str:
+            test_names = "".join(f"{test_name} " for test_name in test_name_list)
+            return f"{color_on} - {title}: {test_names}{self.color_off}\n"
+
+        summary = [f"{self.blue_on}{self.hash_line}{self.color_off}\n", "> test summary : "]
 
         fail_test_num = len(fail_test_name_list)
         pass_test_num = len(pass_test_name_list)
@@ -605,44 +1003,39 @@ class TestPlanLogger:
         total_test_num = fail_test_num + pass_test_num + skip_test_num
 
         if fail_test_num == 0 and skip_test_num == 0:
-            print(
-                f"all {self.green_on}{pass_test_num}{self.color_off} tests {self.green_on}passed{self.color_off}"
+            summary.append(
+                f"all {self.green_on}{pass_test_num}{self.color_off} tests {self.green_on}passed{self.color_off}\n"
             )
         else:
             if pass_test_num > 0:
-                print(
-                    f"only {self.green_on}{pass_test_num}{self.color_off} out of {self.blue_on}{total_test_num}{self.color_off} test passed"
+                summary.append(
+                    f"only {self.green_on}{pass_test_num}{self.color_off} out of {self.blue_on}{total_test_num}{self.color_off} test passed\n"
                 )
             elif skip_test_num == 0:
-                print(
-                    f"all {self.red_on}{fail_test_num}{self.color_off} tests {self.red_on}failed{self.color_off}"
+                summary.append(
+                    f"all {self.red_on}{fail_test_num}{self.color_off} tests {self.red_on}failed{self.color_off}\n"
                 )
             else:
-                print("")  # Just a new line
+                summary.append("\n")  # Just a new line
 
             if pass_test_num > 0:
-                print(f"{self.green_on} - passed      : ", end="")
-                for test_name in pass_test_name_list:
-                    print(f"{test_name} ", end="")
-                print(self.color_off)
+                summary.append(
+                    test_name_list_line(self.green_on, "passed      ", pass_test_name_list)
+                )
 
             if skip_test_num > 0:
-                print(f"{self.yellow_on} - skipped     : ", end="")
-                for test_name in skip_test_name_list:
-                    print(f"{test_name} ", end="")
-                print(self.color_off)
+                summary.append(
+                    test_name_list_line(self.yellow_on, "skipped     ", skip_test_name_list)
+                )
 
             if fail_test_num > 0:
-                print(f"{self.red_on} - failed      : ", end="")
-                for test_name in fail_test_name_list:
-                    print(f"{test_name} ", end="")
-                print(self.color_off)
-
-        print(
-            f"{TestPlanLogger.blue_on}"
-            + "#" * TestPlanLogger.decorator_line_len
-            + f"{TestPlanLogger.color_off}"
-        )
+                summary.append(
+                    test_name_list_line(self.red_on, "failed      ", fail_test_name_list)
+                )
+
+        summary.append(f"{self.blue_on}{self.hash_line}{self.color_off}\n")
+
+        sys.stdout.write("".join(summary))
 
 
 class TestPlanRunner(ABC):
@@ -660,10 +1053,14 @@ class TestPlanRunner(ABC):
         self.test_plan_file = test_plan_file
         self.logger = TestPlanLogger()
 
-    def run(self, test_name_list: list[str] = [], max_retries: int = 0) -> int:
+    def run(
+        self, test_name_list: list[str] = None, max_retries: int = 0, parallel: int = 1
+    ) -> int:
         """
         Run the test plan with the given test names and max retries.
         If no test names are provided, all tests in the test plan are run.
+        If parallel is greater than 1, up to that number of tests not sharing
+        any device are run concurrently.
         The test results are logged and a summary is printed at the end.
         If there are failed tests after all retries, the script exits with code 1.
         """
@@ -672,25 +1069,10 @@ class TestPlanRunner(ABC):
         pending_retries = True
 
         while pending_retries:
-            for test in test_list:
-                dut_port, stub_port = self.get_test_device_ports(test)
-
-                if not test.are_supported_devs_available(dut_port, stub_port):
-                    test_results.register_skip(test.name)
-                    self.logger.test_skip_info(test.name)
-                    continue
-
-                # TODO: Add device.switch management.
-
-                self.logger.test_info(test.name, dut_port, stub_port)
-                ret_code = test.run(dut_port, stub_port)
-
-                if ret_code != 0:
-                    test_results.register_fail(test.name)
-                    self.logger.test_fail_info(test.name)
-                else:
-                    test_results.register_pass(test.name)
-                    self.logger.test_pass_info(test.name)
+            if parallel > 1:
+                self.__run_test_list_parallel(test_list, test_results, parallel)
+            else:
+                self.__run_test_list(test_list, test_results)
 
             self.logger.test_info_footer()
 
@@ -714,7 +1096,105 @@ class TestPlanRunner(ABC):
     Private methods
     """
 
-    def __get_test_list(self, test_name_list: list[str] = []):
+    def __run_test_list(self, test_list: list[TestRunner], test_results: TestPlanResults) -> None:
+        """
+        Run the tests one after the other, registering their results.
+        """
+        for test in test_list:
+            dut_port, stub_port = self.get_test_device_ports(test)
+
+            if not test.are_supported_devs_available(dut_port, stub_port):
+                test_results.register_skip(test.name)
+                self.logger.test_skip_info(test.name)
+                continue
+
+            # TODO: Add device.switch management.
+
+            self.logger.test_info(test.name, dut_port, stub_port)
+            ret_code = test.run(dut_port, stub_port)
+
+            self.__register_result(test, ret_code, test_results)
+
+    def __run_test_list_parallel(
+        self, test_list: list[TestRunner], test_results: TestPlanResults, parallel: int
+    ) -> None:
+        """
+        Run the tests concurrently, registering their results.
+        The tests are grouped in batches of up to "parallel" tests. Each test
+        of a batch gets devices not used by the other tests of the batch
+        (e.g. another attached device of the same board), and the tests
+        which find no free devices wait for a later batch.
+        The tests in a batch run concurrently and the batches run one
+        after the other. Thus, a device is never used by two tests at
+        the same time.
+        Threads are used as the tests are run as subprocesses.
+        Each test is run isolated, with its own run-tests.py results directory,
+        and its output is buffered and printed at once when it completes.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        pending_test_list = []
+        for test in test_list:
+            dut_port, stub_port = self.get_test_device_ports(test)
+
+            if not test.are_supported_devs_available(dut_port, stub_port):
+                test_results.register_skip(test.name)
+                self.logger.test_skip_info(test.name)
+                continue
+
+            pending_test_list.append(test)
+
+        while pending_test_list:
+            batch_test_list = []
+            busy_port_set = set()
+            next_pending_test_list = []
+            for test in pending_test_list:
+                if len(batch_test_list) < parallel:
+                    dut_port, stub_port = self.get_test_device_ports(test, busy_port_set)
+
+                    test_port_set = {dut_port}
+                    if test.requires_multiple_devs():
+                        test_port_set.add(stub_port)
+
+                    if test.are_supported_devs_available(
+                        dut_port, stub_port
+                    ) and busy_port_set.isdisjoint(test_port_set):
+                        batch_test_list.append((test, dut_port, stub_port))
+                        busy_port_set.update(test_port_set)
+                        continue
+
+                next_pending_test_list.append(test)
+
+            pending_test_list = next_pending_test_list
+
+            with ThreadPoolExecutor(max_workers=len(batch_test_list)) as executor:
+                future_test_map = {}
+                for test, dut_port, stub_port in batch_test_list:
+                    future = executor.submit(test.run_isolated, dut_port, stub_port)
+                    future_test_map[future] = (test, dut_port, stub_port)
+
+                # The output and results are printed and registered from this thread only
+                for future in as_completed(future_test_map):
+                    test, dut_port, stub_port = future_test_map[future]
+                    ret_code, test_output = future.result()
+                    self.logger.test_info(test.name, dut_port, stub_port)
+                    self.logger.test_output(test_output)
+                    self.__register_result(test, ret_code, test_results)
+
+    def __register_result(
+        self, test: TestRunner, ret_code: int, test_results: TestPlanResults
+    ) -> None:
+        """
+        Register and log the result of a test run.
+        """
+        if ret_code != 0:
+            test_results.register_fail(test.name)
+            self.logger.test_fail_info(test.name)
+        else:
+            test_results.register_pass(test.name)
+            self.logger.test_pass_info(test.name)
+
+    def __get_test_list(self, test_name_list: list[str] = None):
         """
         Get the list of tests to run from the test plan file.
         If no test names are provided, all tests in the test plan are returned.
@@ -722,7 +1202,7 @@ class TestPlanRunner(ABC):
         """
         test_plan_list = TestRunner.load_list_from_yaml(self.test_plan_file)
 
-        if test_name_list == []:
+        if not test_name_list:
             return test_plan_list
 
         test_list = []
@@ -734,11 +1214,15 @@ class TestPlanRunner(ABC):
         return test_list
 
     @abstractmethod
-    def get_test_device_ports(self, test: TestRunner) -> tuple[str, str]:
+    def get_test_device_ports(
+        self, test: TestRunner, busy_port_set: set[str] = frozenset()
+    ) -> tuple[str, str]:
         """
         Abstract method to get the test device ports for the given test.
         This method must be implemented by the derived classes.
         It should return a tuple of (dut_port, stub_port).
+        The ports in busy_port_set are in use by other tests, and
+        other available ports should be returned instead, if any.
         """
         return None, None
 
@@ -755,6 +1239,7 @@ class TestPlanRunnerHIL(TestPlanRunner):
         super().__init__(test_plan_file)
         self.hil_devs_file = hil_devs_file
         self.board = board
+        self.__devs_port_cache: dict[tuple[str, str], list[str]] = {}
 
     def set_board(self, board: str) -> None:
         """
@@ -763,66 +1248,82 @@ class TestPlanRunnerHIL(TestPlanRunner):
         """
         self.board = board
 
-    def run(self, test_name_list: list[str] = [], max_retries: int = 0) -> int:
+    def run(
+        self, test_name_list: list[str] = None, max_retries: int = 0, parallel: int = 1
+    ) -> int:
         """
         Run the test plan with the given test names and max retries.
         It logs the test plan information before running the tests."""
         self.logger.test_plan_info(self.test_plan_file, self.hil_devs_file, self.board)
-        return super().run(test_name_list, max_retries)
+        # The connected devices are looked up again on every run
+        self.__devs_port_cache.clear()
+        return super().run(test_name_list, max_retries, parallel)
 
     """ 
     Private methods
     """
 
-    def get_test_device_ports(self, test: TestRunner) -> tuple[str, str]:
+    def get_test_device_ports(
+        self, test: TestRunner, busy_port_set: set[str] = frozenset()
+    ) -> tuple[str, str]:
         """
         Get the test device ports for the given test.
         It uses the HIL devices file and the board name to find the appropriate ports.
         Returns a tuple of (dut_port, stub_port).
 
         If multiple test devices are available for the given role, it takes the first one for DUT
-        and any other for the STUB.
+        and any other for the STUB. The ports in busy_port_set are not taken.
+        The ports are looked up lazily, so the search stops as soon as they are found.
         """
-        dut_port = None
         stub_port = None
 
-        dut_port_list = self.__get_ports_for_role(test, self.board, TestRunner.DeviceRole.DUT)
+        # Take the first free one
+        dut_port_iter = self.__iter_ports_for_role(test, self.board, TestRunner.DeviceRole.DUT)
+        dut_port = next((port for port in dut_port_iter if port not in busy_port_set), None)
 
-        if not dut_port_list:
+        if dut_port is None:
             return dut_port, stub_port
 
-        dut_port = dut_port_list[0]  # Take the first
-
         if test.requires_multiple_devs():
-            stub_port_list = self.__get_ports_for_role(
+            stub_port_iter = self.__iter_ports_for_role(
                 test, self.board, TestRunner.DeviceRole.STUB
             )
 
-            for port in stub_port_list:
-                # Take any element from stub_port_list that is not dut_port
-                if port != dut_port:
+            for port in stub_port_iter:
+                # Take any free element from stub_port_list that is not dut_port
+                if port != dut_port and port not in busy_port_set:
                     stub_port = port
                     break
 
         return dut_port, stub_port
 
-    def __get_ports_for_role(
+    def __iter_ports_for_role(
         self, test: TestRunner, board: str, device_role: TestRunner.DeviceRole
-    ) -> list[str]:
+    ):
         """
-        Get the list of ports for the given device role (dut or stub) and board.
+        Iterate the ports for the given device role (dut or stub) and board.
         It uses the HIL devices file to find the available ports.
+        The ports of each supported device are only looked up
+        when the ports of the previous ones have been consumed.
         """
         supported_dev_list = test.get_supported_dev_list(device_role, board)
 
-        port_list = []
         for device in supported_dev_list:
-            available_ports = get_devices_port(
-                device.get("board"), self.hil_devs_file, device.get("version", None)
+            yield from self.__get_devices_port(device.get("board"), device.get("version", None))
+
+    def __get_devices_port(self, board: str, version: str = None) -> list[str]:
+        """
+        Get the ports of the available devices for the given board and version.
+        Most tests of a plan support the same devices, so the ports are
+        looked up once per board and version during a test plan run.
+        """
+        devs_key = (board, version)
+        if devs_key not in self.__devs_port_cache:
+            self.__devs_port_cache[devs_key] = get_devices_port(
+                board, self.hil_devs_file, version
             )
-            port_list.extend(available_ports)
 
-        return port_list
+        return self.__devs_port_cache[devs_key]
 
 
 class TestPlanRunnerPorts(TestPlanRunner):
@@ -846,22 +1347,25 @@ class TestPlanRunnerPorts(TestPlanRunner):
         self.dut_port = dut_port
         self.stub_port = stub_port
 
-    def run(self, test_name_list: list[str] = [], max_retries: int = 0):
+    def run(self, test_name_list: list[str] = None, max_retries: int = 0, parallel: int = 1):
         """
         Run the test plan with the given test names and max retries.
         It logs the test plan information before running the tests.
         """
         self.logger.test_plan_info(self.test_plan_file)
-        return super().run(test_name_list, max_retries)
+        return super().run(test_name_list, max_retries, parallel)
 
     """ 
     Private methods
     """
 
-    def get_test_device_ports(self, test: TestRunner) -> tuple[str, str]:
+    def get_test_device_ports(
+        self, test: TestRunner, busy_port_set: set[str] = frozenset()
+    ) -> tuple[str, str]:
         """
         Get the test device ports for the given test.
-        It returns the ports set in the instance.
+        It returns the ports set in the instance. As there are no other
+        devices, the tests using them can not run concurrently.
         """
         return self.dut_port, self.stub_port
 
@@ -875,64 +1379,84 @@ class TestPlanRunnerCLI:
     def __init__(self):
         """
         Initializes the TestPlanRunnerCLI instance.
-        It sets up the argument parser.
+        The argument parser is only set up when the arguments are parsed,
+        so that importing this module does not import argparse.
+        """
+        self.parser = None
+
+    def parse(self) -> "argparse.Namespace":
+        """
+        Parse the command line arguments and validate them.
+        It also sets the default values for the arguments if not provided.
+        """
+        self.parser = TestPlanRunnerCLI.__create_parser()
+        args = self.parser.parse_args()
+        args = self.__set_validate_args(args)
+        return args
+
+    """
+    Private methods
+    """
+
+    @staticmethod
+    def __create_parser() -> "argparse.ArgumentParser":
         """
-        self.parser = argparse.ArgumentParser(description="MicroPython test suites runner.")
-        self.parser.add_argument("test_suite", nargs="*", type=str, help="Test suite to run.")
-        self.parser.add_argument(
+        Set up the argument parser.
+        """
+        # Only imported for the command line use, not when imported as module
+        import argparse
+
+        parser = argparse.ArgumentParser(description="MicroPython test suites runner.")
+        parser.add_argument("test_suite", nargs="*", type=str, help="Test suite to run.")
+        parser.add_argument(
             "--test-plan", type=str, default=None, help="Path to the test plan file."
         )
-        self.parser.add_argument(
+        parser.add_argument(
             "--hil-devs", type=str, default=None, help="Path to the HIL devices file."
         )
-        self.parser.add_argument(
+        parser.add_argument(
             "-b",
             "--board",
             type=str,
             default=None,
             help="Test board name (only used with --hil-devs).",
         )
-        self.parser.add_argument(
+        parser.add_argument(
             "-d",
             "--dut-port",
             type=str,
             default=None,
             help="Device under test port. Default is /dev/ttyACM0.",
         )
-        self.parser.add_argument(
+        parser.add_argument(
             "-s",
             "--stub-port",
             type=str,
             default=None,
             help="Stub device port. Default is /dev/ttyACM1.",
         )
-        self.parser.add_argument(
+        parser.add_argument(
             "--max-retries",
             type=int,
             default=0,
             help="Maximum number of retries for failed tests.",
         )
-        self.parser.add_argument(
+        parser.add_argument(
+            "--parallel",
+            type=int,
+            default=1,
+            help="Maximum number of tests run concurrently. Tests sharing a device are never run concurrently. Default is 1.",
+        )
+        parser.add_argument(
             "--mpy-root-dir",
             type=str,
             default=None,
             help="Path to the root of the MicroPython repository. Default is two levels up from this script.",
         )
 
-    def parse(self) -> argparse.Namespace:
-        """
-        Parse the command line arguments and validate them.
-        It also sets the default values for the arguments if not provided.
-        """
-        args = self.parser.parse_args()
-        args = self.__set_validate_args(args)
-        return args
+        return parser
 
-    """
-    Private methods
-    """
-
-    def __set_validate_args(self, args: argparse.Namespace) -> argparse.Namespace:
+    def __set_validate_args(self, args: "argparse.Namespace") -> "argparse.Namespace":
         """
         Validate the command line arguments and set default values if not provided.
         If hil devices file is provided, the board is required, and the
@@ -967,17 +1491,12 @@ class TestPlanRunnerCLI:
                 args.stub_port = "/dev/ttyACM1"
 
         if args.test_plan is None:
-            args.test_plan = os.path.abspath(
-                os.path.join(os.path.abspath(os.path.dirname(__file__)), "test-plan.yml")
-            )
+            args.test_plan = _default_test_plan()
         else:
             args.test_plan = os.path.abspath(args.test_plan)
 
         if args.mpy_root_dir is None:
-            run_test_plan_script_dir = os.path.abspath(os.path.dirname(__file__))
-            args.mpy_root_path = os.path.abspath(
-                os.path.join(run_test_plan_script_dir, "..", "..")
-            )
+            args.mpy_root_path = _default_mpy_root_dir()
 
         return args
 
@@ -1002,7 +1521,7 @@ def main_run_test_plan():
             tpr_args.test_plan, tpr_args.dut_port, tpr_args.stub_port
         )
 
-    test_plan_runner.run(tpr_args.test_suite, tpr_args.max_retries)
+    test_plan_runner.run(tpr_args.test_suite, tpr_args.max_retries, tpr_args.parallel)
 
 
 if __name__ == "__main__":
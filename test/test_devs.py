@@ -5,10 +5,14 @@ A YAML file with device definitions of attached devices is required.
 Remember that the udev rules must be set properly to allow
 non-root access to the USB hubs.
 """
+import os
 import sys
 import time
 
-sys.path.append('..')
+# The modules under test are in the parent directory of this script
+module_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if module_dir not in sys.path:
+    sys.path.append(module_dir)
 
 from devs import Device, DevSwitch
 
@@ -0,0 +1,145 @@
+"""
+This is a basic test for the parallel mode of the test plan runner.
+It does not require any attached device: the test plan is run with a
+fake runner, which provides the ports of a fake board with two devices,
+in a fake MicroPython tests directory, whose run-tests.py only logs
+its runs and fails the tests named "bad".
+"""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+# The modules under test are in the parent directory of this script
+module_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if module_dir not in sys.path:
+    sys.path.append(module_dir)
+
+import run_test_plan
+from run_test_plan import TestPlanRunner
+
+"""
+Fake run-tests.py.
+Each run logs its port and its start and end times. The failed tests
+results are stored in the results directory (--result-dir), and printed
+from there with --print-failures, as the upstream run-tests.py does.
+"""
+fake_run_tests_py = """
+import os, sys, time
+args = sys.argv[1:]
+result_dir = "results"
+if "--result-dir" in args:
+    index = args.index("--result-dir")
+    result_dir = args[index + 1]
+    del args[index : index + 2]
+os.makedirs(result_dir, exist_ok=True)
+if "--print-failures" in args:
+    for result_file in sorted(os.listdir(result_dir)):
+        print("FAILURE " + result_file)
+    sys.exit(0)
+port = args[1].split(":", 1)[1]
+start = time.monotonic()
+time.sleep(0.5)
+return_code = 0
+for test in args[2:]:
+    if test.startswith("bad"):
+        open(os.path.join(result_dir, test + ".out"), "w").close()
+        return_code = 1
+with open("runs.log", "a") as f:
+    f.write(f"{port} {start} {time.monotonic()}\\n")
+sys.exit(return_code)
+"""
+
+fake_test_plan_yml = """
+- name: ok_1
+  test:
+    script: ok_1.py
+- name: ok_2
+  test:
+    script: ok_2.py
+- name: bad_1
+  test:
+    script: bad_1.py
+- name: ok_3
+  test:
+    script: ok_3.py
+"""
+
+
+class FakeBoardRunner(TestPlanRunner):
+    """
+    Test plan runner for a fake board with two attached devices.
+    """
+
+    port_list = ["/dev/fake0", "/dev/fake1"]
+
+    def get_test_device_ports(self, test, busy_port_set=frozenset()):
+        dut_port = next((port for port in self.port_list if port not in busy_port_set), None)
+        return dut_port, None
+
+
+"""
+Set up the fake MicroPython tests directory with the test plan.
+The test runners take it from the default MicroPython root directory.
+The results directories of the tests and the test plan cache are
+created in directories of this test only, to check that the results
+directories are removed.
+"""
+mpy_root_dir = tempfile.mkdtemp(prefix="mpy-test-ext-")
+mpy_test_dir = os.path.join(mpy_root_dir, "tests")
+os.mkdir(mpy_test_dir)
+with open(os.path.join(mpy_test_dir, "run-tests.py"), "w") as f:
+    f.write(fake_run_tests_py)
+
+test_plan_file = os.path.join(mpy_test_dir, "test-plan.yml")
+with open(test_plan_file, "w") as f:
+    f.write(fake_test_plan_yml)
+
+run_test_plan._default_mpy_root_dir = lambda: mpy_root_dir
+tempfile.tempdir = os.path.join(mpy_root_dir, "tmp")
+os.mkdir(tempfile.tempdir)
+os.environ["XDG_CACHE_HOME"] = os.path.join(mpy_root_dir, "cache")
+
+print("1. Run the test plan with --parallel 4 on a board with two devices...")
+output = StringIO()
+exit_code = 0
+with redirect_stdout(output):
+    try:
+        FakeBoardRunner(test_plan_file).run(parallel=4)
+    except SystemExit as e:
+        exit_code = e.code
+print(output.getvalue())
+
+print("2. Check the test runs...")
+run_list = []
+with open(os.path.join(mpy_test_dir, "runs.log"), "r") as f:
+    for line in f:
+        port, start, end = line.split()
+        run_list.append((port, float(start), float(end)))
+
+assert len(run_list) == 4, f"expected 4 test runs, got {len(run_list)}"
+
+max_concurrent_runs = 0
+for port, start, end in run_list:
+    concurrent_run_list = [run for run in run_list if run[1] <= start < run[2]]
+    concurrent_port_list = [run[0] for run in concurrent_run_list]
+    assert len(concurrent_port_list) == len(
+        set(concurrent_port_list)
+    ), f"a device was used by concurrent tests: {concurrent_port_list}"
+    max_concurrent_runs = max(max_concurrent_runs, len(concurrent_run_list))
+
+assert max_concurrent_runs == 2, f"expected 2 concurrent tests, got {max_concurrent_runs}"
+
+print("3. Check the test results and output...")
+assert exit_code == 1, f"expected exit code 1 for the failed test, got {exit_code}"
+assert output.getvalue().count("FAILURE") == 1, "expected the failure of bad_1 only once"
+assert "FAILURE bad_1.py.out" in output.getvalue()
+assert "> failed test  : bad_1" in output.getvalue()
+assert os.listdir(tempfile.tempdir) == [], "the results directories were not removed"
+assert not os.path.exists(os.path.join(mpy_test_dir, "results")), "shared results directory used"
+
+shutil.rmtree(mpy_root_dir)
+
+print("All checks passed")
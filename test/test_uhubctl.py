@@ -4,8 +4,12 @@ Remember that the udev rules must be set properly to allow
 non-root access to the USB hubs.
 """
 import time
+import os
 import sys
-sys.path.append('..')
+# The modules under test are in the parent directory of this script
+module_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if module_dir not in sys.path:
+    sys.path.append(module_dir)
 
 from uhubctl import Uhubctl
 
@@ -1,8 +1,15 @@
 from enum import Enum
-import re
-import subprocess
+import shutil
+import sys
+import time
 from dataclasses import dataclass
 
+# Port status values, shared by all the status results
+STATUS_OFF = "off"
+STATUS_ON = "on"
+STATUS_ON_CONNECTED = "on connected"
+STATUS_UNKNOWN = "unknown"
+
 class Uhubctl:
     """
     This class provides a wrapper around the uhubctl command-line tool
@@ -24,6 +31,21 @@ class Uhubctl:
     
     def __init__(self):
         self.last_cmd_output = ""
+        # Base command line, prepended to the arguments of every command.
+        # The executable is resolved once, instead of searching PATH
+        # for every command.
+        self.__base_cmd = (shutil.which("uhubctl") or "uhubctl",)
+        # Ports found in the last full scan, with their port status line.
+        # It is used to answer the status and description queries without
+        # running uhubctl for each of them, while it is not older than
+        # scan_cache_ttl_s seconds. Any action discards it.
+        self.scan_cache_ttl_s = 1.0
+        self.__scan_cache = None
+        self.__scan_time = 0.0
+        # Description words index and ports status map of the last scan,
+        # built on demand
+        self.__desc_index = None
+        self.__status_map = None
 
     def run_action(self, action: Cmd, hub: str, port: int) -> None:
         """
@@ -46,20 +68,81 @@ class Uhubctl:
 
         self.__run_cmd(cmd)
 
+        # The ports status has changed
+        self.__scan_cache = None
+        self.__desc_index = None
+        self.__status_map = None
+
     def get_hub_port_by_desc(self, desc_match: str) -> tuple[str, int]:
         """
-        Call uhubctl to get the hub location and port number for a given 
+        Get the hub location and port number for a given 
         string which is part of the device description in the device
         entry of the uhubctl output.
+        A whole description word (e.g. the serial number) is looked up in
+        the description index, otherwise the port lines are searched.
+        Both use the same scan, so looking up several devices
+        only runs uhubctl once.
+
+        A port whose description has desc_match as a whole word takes
+        precedence over an earlier port which only contains it as part
+        of a word. E.g. the serial number "12D2400" finds the device with
+        that serial number, and not an earlier one with "0D170C5A012D2400".
+        Only if no description has it as a whole word, the first port
+        line containing desc_match is taken (as uhubctl --search does).
 
         Args:
             desc_match: Matching pattern or string appearing in the device description
         Returns:
             (hub, port) tuple if found, (None, None) if not found
         """
-        self.__run_cmd(["--search", desc_match])
-        
-        return self.__output_search_hub_port_by_desc(desc_match)
+        hub_port = self.build_desc_index().get(desc_match)
+        if hub_port is not None:
+            return hub_port
+
+        for (hub, port, port_line) in self.__scan_cache:
+            if desc_match in port_line:
+                return (hub, port)
+
+        return (None, None)
+
+    def build_desc_index(self) -> dict[str, tuple[str, int]]:
+        """
+        Build an index with the hub and port of the attached devices
+        by each word of their description. It scans the hubs, unless
+        the last scan is recent (see refresh()).
+
+        Returns:
+            A dict mapping each description word to its (hub, port) tuple.
+            If a word appears in several ports, the first one is kept.
+
+        Example of expected uhubctl output format for a device with USB 3.0 duality
+        (More info at https://github.com/mvp/uhubctl?tab=readme-ov-file#usb-30-duality-note)
+        where a PSOC6 KitProg3 with serial number 1106035A012D2400 is connected:
+
+            Current status for hub 2-1 [0bda:0411 Generic USB3.2 Hub, USB 3.20, 4 ports, ppps]
+              Port 2: 02a0 power 5gbps Rx.Detect
+            Current status for hub 1-1 [0bda:5411 Generic USB2.1 Hub, USB 2.10, 4 ports, ppps]
+              Port 2: 0103 power enable connect [04b4:f155 Cypress Semiconductor KitProg3 CMSIS-DAP 1106035A012D2400]
+
+        The index maps "1106035A012D2400" (and "KitProg3", "04b4:f155", etc.)
+        to ("1-1", 2) for the above example.
+        """
+        self.refresh()
+
+        if self.__desc_index is None:
+            desc_index = {}
+            for (hub, port, port_line) in self.__scan_cache:
+                desc_start = port_line.find("[")
+                if desc_start == -1:
+                    continue
+
+                desc = port_line[desc_start + 1 :].rstrip("]")
+                for desc_word in desc.split():
+                    desc_index.setdefault(desc_word, (hub, port))
+
+            self.__desc_index = desc_index
+
+        return self.__desc_index
     
     def get_status(self, hub: str, port: int) -> str:
         """
@@ -73,9 +156,15 @@ class Uhubctl:
             "on" - Port is powered on.
             "not connected" - Port is on but no device connected
             "unknown" - Could not determine status
+        The status of all the ports is taken from the same scan, so
+        querying several ports only runs uhubctl once (see refresh()).
         """
-        self.__run_cmd(["--location", hub, "--port", f"{port}"])
-        return self.__output_search_port_status(hub, port)
+        self.refresh()
+
+        if self.__status_map is None:
+            self.__status_map = self.__build_status_map()
+
+        return self.__status_map.get((hub, port), STATUS_UNKNOWN)
     
     def scan_hubs_ports(self) -> list[tuple[str, int]]:
         """ 
@@ -84,13 +173,48 @@ class Uhubctl:
         Returns:
             A list of (hub, port) tuples for all discovered ports.
         """
+        return [(hub, port) for (hub, port, port_line) in self.scan_hubs_ports_desc()]
+
+    def scan_hubs_ports_desc(self) -> list[tuple[str, int, str]]:
+        """ 
+        Scan to find all available uhubctl compatible hubs and their ports,
+        together with the port status line, which includes the description
+        of the attached device (if any).
+        
+        Returns:
+            A list of (hub, port, port_line) tuples for all discovered ports.
+        """
         self.__run_cmd([])
-        return self.__output_scan_hub_ports()
+        self.__scan_cache = self.__output_scan_hub_ports_desc()
+        self.__scan_time = time.monotonic()
+        self.__desc_index = None
+        self.__status_map = None
+        return self.__scan_cache
+
+    def refresh(self, ttl: float = None) -> None:
+        """
+        Scan all the hubs and ports, unless the last scan is not older
+        than ttl seconds (by default scan_cache_ttl_s).
+        The status and description queries are then answered from
+        the scan, instead of running uhubctl for each of them.
+        """
+        if not self.__is_scan_cache_valid(ttl):
+            self.scan_hubs_ports_desc()
     
     """
     Private methods
     """
 
+    def __is_scan_cache_valid(self, ttl: float = None) -> bool:
+        """
+        Check if there is a scan not older than ttl seconds
+        (by default scan_cache_ttl_s).
+        """
+        if ttl is None:
+            ttl = self.scan_cache_ttl_s
+
+        return self.__scan_cache is not None and time.monotonic() - self.__scan_time <= ttl
+
     def __run_cmd(self, cmd_args: list[str]) -> None:
         """
         Run the uhubctl command with the specified arguments.
@@ -106,9 +230,17 @@ class Uhubctl:
             The standard output from the uhubctl command as a string.
             An empty string if no devices are detected or an error occurs.
         """
-        uhub_cmd = ["uhubctl"] + cmd_args
-        uhub_proc = subprocess.run(uhub_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        uhub_err = uhub_proc.stderr.decode('utf-8')
+        # Imported on first use, the scans and queries answered
+        # from the cached scan do not need it
+        import subprocess
+
+        uhub_cmd = self.__base_cmd + tuple(cmd_args)
+        # Not closing the file descriptors (they are not inheritable by default)
+        # and the absolute executable path allow the faster posix_spawn()
+        uhub_proc = subprocess.run(
+            uhub_cmd, capture_output=True, encoding='utf-8', close_fds=False
+        )
+        uhub_err = uhub_proc.stderr
 
         if uhub_proc.returncode != 0:
             if not Uhubctl.__are_devices_detected(uhub_err):  
@@ -117,8 +249,9 @@ class Uhubctl:
             
             print(f"error: uhubctl command '{cmd_args}' failed")
             self.last_cmd_output = ""
+            return
     
-        self.last_cmd_output =  uhub_proc.stdout.decode('utf-8')
+        self.last_cmd_output =  uhub_proc.stdout
 
     @staticmethod
     def __are_devices_detected(uhubctl_stderr : str) -> bool:
@@ -137,53 +270,15 @@ class Uhubctl:
             return False
         return True
     
-    def __output_search_hub_port_by_desc(self, desc_match: str) -> tuple[str, int]:
+    def __build_status_map(self) -> dict[tuple[str, int], str]:
         """
-        Parse uhubctl output to find hub and port for given description match.
-        
-        Args:
-            desc_match: Matching pattern or string appearing in the device description
-        Returns:
-            (hub, port) tuple if found, (None, None) if not found
-
-
-        Example of expected uhubctl output format for a device with USB 3.0 duality
-        (More info at https://github.com/mvp/uhubctl?tab=readme-ov-file#usb-30-duality-note)
-        where a PSOC6 KitProg3 with serial number 1106035A012D2400 is connected:
-
-            Current status for hub 2-1 [0bda:0411 Generic USB3.2 Hub, USB 3.20, 4 ports, ppps]
-              Port 2: 02a0 power 5gbps Rx.Detect
-            Current status for hub 1-1 [0bda:5411 Generic USB2.1 Hub, USB 2.10, 4 ports, ppps]
-              Port 2: 0103 power enable connect [04b4:f155 Cypress Semiconductor KitProg3 CMSIS-DAP 1106035A012D2400]
-
-        The method should return ("1-1", 2) for the above example when
-        desc_match is "1106035A012D2400".
-        """
-        output_lines = self.last_cmd_output.strip().split('\n')
-        current_hub = None
-        
-        for line in output_lines:
-            line = line.strip()
-            
-            current_hub = Uhubctl.__line_search_update_hub(line, current_hub)
-            current_port = Uhubctl.__line_search_port(line)
-
-            if current_hub and current_port and desc_match in line :
-                return (current_hub, current_port)
-        
-        return (None, None)
-
-    def __output_search_port_status(self, hub: str, port: int) -> str:
-        """
-        Get the current status of this hub port.
+        Get the current status of all the ports of the last scan.
 
-        Args:
-            hub: The hub identifier (e.g., "1-1.3")
-            port: The port number (e.g., 2)
         Returns:
+            A dict mapping each (hub, port) tuple to its status:
             "off" - Port is powered off
             "on" - Port is powered on.
-            "not connected" - Port is on but no device connected 
+            "on connected" - Port is on and a device is connected 
             "unknown" - Could not determine status 
 
         Example of expected uhubctl output for a set of ports with different statuses.
@@ -206,47 +301,66 @@ class Uhubctl:
         includes additional information like the speed of certain usb status.
 
         """
-        output_lines = self.last_cmd_output.strip().split('\n')
-        current_hub = None
+        status_map = {}
+        for (hub, port, port_line) in self.__scan_cache:
+            # The first line of a port is kept, as in the single port search
+            if (hub, port) not in status_map:
+                status_map[(hub, port)] = Uhubctl.__line_port_status(port_line)
 
-        for line in output_lines:
-            line = line.strip()
-           
-            current_hub = Uhubctl.__line_search_update_hub(line, current_hub)
-            current_port = Uhubctl.__line_search_port(line)
-
-            if hub == current_hub and port == current_port:                
-                if " off" in line:
-                    return "off"
-                elif " power" in line and  "enable connect" in line:
-                    return "on connected"
-                elif " power" in line:
-                    return "on"
-                else:
-                    return "unknown"
-        
-        return "unknown"
+        return status_map
+
+    @staticmethod
+    def __line_port_status(port_line: str) -> str:
+        """
+        Get the port status from its (stripped) port status line.
+        Returns:
+            "off", "on connected", "on" or "unknown"
+        """
+        if " off" in port_line:
+            return STATUS_OFF
+        elif " power" in port_line and  "enable connect" in port_line:
+            return STATUS_ON_CONNECTED
+        elif " power" in port_line:
+            return STATUS_ON
+        else:
+            return STATUS_UNKNOWN
     
-    def __output_scan_hub_ports(self) -> list[tuple[str, int]]:
+    def __output_scan_hub_ports_desc(self) -> list[tuple[str, int, str]]:
         """ 
-        Scan to find all available uhubctl compatible hubs and their ports.
+        Scan to find all available uhubctl compatible hubs and their ports,
+        together with the (stripped) port status line.
         Returns:
-            A list of (hub, port) tuples for all discovered ports.
+            A list of (hub, port, port_line) tuples for all discovered ports.
+        """
+        return self.__parse_output()
+
+    def __parse_output(self) -> list[tuple[str, int, str]]:
+        """
+        Parse the last uhubctl output in a single pass.
+        All the output searches are done over the port lines of each hub,
+        so only the hub and port lines are parsed (in the section of a hub).
+        Returns:
+            A list of (hub, port, port_line) tuples, with the stripped
+            port line, for all the ports in the output.
         """
-        discovered_ports = []
-        output_lines = self.last_cmd_output.strip().split('\n')
+        # Nothing to parse if no devices are detected or the command failed
+        if not self.last_cmd_output:
+            return []
+
+        parsed_ports = []
         current_hub = None
 
-        for line in output_lines:
+        for line in self.last_cmd_output.splitlines():
             line = line.strip()
-            
-            current_hub = Uhubctl.__line_search_update_hub(line, current_hub)
-            current_port = Uhubctl.__line_search_port(line)
 
-            if current_hub and current_port:
-                discovered_ports.append((current_hub, current_port))
+            if line.startswith("Current status for hub"):
+                current_hub = Uhubctl.__line_search_update_hub(line, current_hub)
+            elif current_hub and line.startswith("Port"):
+                current_port = Uhubctl.__line_search_port(line)
+                if current_port:
+                    parsed_ports.append((current_hub, current_port, line))
         
-        return discovered_ports
+        return parsed_ports
 
     @staticmethod
     def __line_search_update_hub(output_line : str, current_hub: str) -> str:
@@ -267,10 +381,13 @@ class Uhubctl:
         Returns:
             The updated hub value if found, otherwise the current_hub value.
         """
-        if output_line.startswith("Current status for hub"):
-            hub_match = re.search(r'hub (\S+)', output_line)
-            if hub_match:
-                return hub_match.group(1)
+        hub_prefix = "Current status for hub "
+        if output_line.startswith(hub_prefix):
+            # The hub id is the first word after the prefix
+            hub_words = output_line[len(hub_prefix) :].split(maxsplit=1)
+            if hub_words:
+                # Interned, the same hub ids are found again on every scan
+                return sys.intern(hub_words[0])
         return current_hub
 
     @staticmethod        
@@ -284,9 +401,12 @@ class Uhubctl:
             The port number if found, otherwise None.
         """
         port_number = None
-        if output_line.startswith("Port"):
-            port_match = re.search(r'Port (\d+):', output_line)
-            if port_match:
-                    port_number = int(port_match.group(1))
+        if output_line.startswith("Port "):
+            # The port number is between the "Port " prefix and the colon
+            colon_index = output_line.find(":", 5)
+            if colon_index > 5:
+                port_str = output_line[5:colon_index]
+                if port_str.isdecimal():
+                    port_number = int(port_str)
 
         return port_number
\ No newline at end of file